@@ -53,6 +53,9 @@ class Settings(BaseSettings):
     OSS_ENDPOINT: Optional[str] = os.getenv("OSS_ENDPOINT")
     OSS_REGION: Optional[str] = os.getenv("OSS_REGION")
     AUTO_UPLOAD_TO_OSS: bool = os.getenv("AUTO_UPLOAD_TO_OSS", "false").lower() == "true"
+    OSS_MAX_CONCURRENT_UPLOADS: int = int(os.getenv("OSS_MAX_CONCURRENT_UPLOADS", 12))
+    OSS_UPLOAD_THREADS: int = int(os.getenv("OSS_UPLOAD_THREADS", 4))
+    OSS_POOL_SIZE: int = int(os.getenv("OSS_POOL_SIZE", 32))
     
     # CORS配置
     BACKEND_CORS_ORIGINS: List[str] = []
@@ -78,6 +81,9 @@ class Settings(BaseSettings):
     # 服务器设置
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", 8000))
+    # 运行环境与工作进程数，由run.py读取
+    APP_ENV: str = os.getenv("APP_ENV", "production")
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", 1))
     
     class Config:
         env_file = ".env"
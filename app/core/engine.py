@@ -13,7 +13,7 @@ import yaml
 import asyncio
 import uuid
 import re  # 添加正则表达式模块
-from typing import Dict, List, Any, Optional, Union, Callable, Iterator, TypedDict, Annotated, Literal
+from typing import Dict, List, Any, Optional, Union, Callable, Iterator, AsyncIterator, Tuple, TypedDict, Annotated, Literal
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -1049,6 +1049,128 @@ class VisionWeaverEngine:
         else:
             return workflow.compile()
     
+    def _prepare_run(
+        self,
+        user_input: str,
+        thread_id: Optional[str] = None,
+        callbacks: Optional[List[Any]] = None,
+        input_images: Optional[List[str]] = None,
+        run_mode: str = "blocking"
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        构建工作流的初始状态和运行配置
+        
+        Args:
+            user_input: 用户输入的文本
+            thread_id: 对话线程ID，如启用了内存功能则需要提供
+            callbacks: 可选的回调函数列表
+            input_images: 可选的输入图像路径列表，用于图像合成（如logo、二维码等）
+            run_mode: 运行模式，arun一次性返回结果时为"blocking"，astream逐阶段产出事件时为"streaming"
+            
+        Returns:
+            (初始状态, 运行配置)
+        """
+        # 确保每次请求都有唯一的thread_id
+        request_thread_id = thread_id or f"thread_{uuid.uuid4()}"
+        logger.info(f"处理用户输入: {user_input[:50]}... (会话ID: {request_thread_id})")
+        
+        # 处理输入图像路径
+        if input_images:
+            # 验证所有图像路径是否存在
+            valid_images = []
+            for img_path in input_images:
+                if os.path.exists(img_path):
+                    valid_images.append(img_path)
+                    logger.info(f"添加用户提供的图像: {img_path}")
+                else:
+                    logger.warning(f"图像路径不存在，忽略: {img_path}")
+                    
+            if valid_images:
+                logger.info(f"用户提供了 {len(valid_images)} 张有效图像用于合成")
+            else:
+                logger.warning("所有提供的图像路径都无效，图像合成将被跳过")
+                input_images = None
+        
+        # 创建初始状态
+        state = {
+            "messages": [HumanMessage(content=user_input)],
+            "current_stage": "initial_assessment",
+            "design_result": None,
+            "image_result": None,
+            "events": [],
+            "start_time": asyncio.get_event_loop().time(),
+            "output": None,
+            "error": None,
+            "request_id": str(uuid.uuid4()),  # 添加唯一请求ID，确保状态隔离
+            "input_images": valid_images if input_images else None,
+            "composed_image_result": None
+        }
+        
+        # 如果有输入图像，添加事件
+        if state["input_images"]:
+            state = self._add_event(state, "input_images_added", {
+                "message": f"用户提供了 {len(state['input_images'])} 张图像用于合成",
+                "image_count": len(state["input_images"]),
+                "image_paths": [os.path.basename(path) for path in state["input_images"]]
+            })
+        
+        # 准备配置
+        config = {
+            "recursion_limit": 25,  # 设置最大递归限制
+            "run_mode": run_mode,  # 由调用方决定：arun为阻塞模式，astream为流式模式
+            "ensure_state_isolation": True  # 确保状态隔离
+        }
+        
+        if self.with_memory and request_thread_id:
+            if "configurable" not in config:
+                config["configurable"] = {}
+            config["configurable"]["thread_id"] = request_thread_id
+            logger.debug(f"使用会话ID: {request_thread_id}")
+        
+        if callbacks:
+            config["callbacks"] = callbacks
+        
+        return state, config
+    
+    def _build_response(self, result: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+        """根据工作流最终状态构建返回结果"""
+        # 计算耗时
+        elapsed = round(asyncio.get_event_loop().time() - state["start_time"], 2)
+        logger.info(f"工作流执行完成，耗时: {elapsed}秒")
+        
+        # 构建返回结果
+        response = {
+            "output": result.get("output", "抱歉，处理过程中出现了问题。"),
+            "events": result.get("events", []),
+            "request_id": result.get("request_id", state["request_id"]),  # 保留请求ID
+            "input_images": result.get("input_images", state["input_images"]),
+            "composed_image_result": result.get("composed_image_result", state["composed_image_result"])
+        }
+        
+        # 添加错误信息（如果有）
+        if result.get("error"):
+            response["error"] = result["error"]
+            
+        # 添加设计结果（如果有）
+        if result.get("design_result"):
+            response["design_result"] = result["design_result"]
+            
+        # 添加图像结果（如果有）
+        if result.get("image_result"):
+            response["image_result"] = result["image_result"]
+        
+        return response
+    
+    def _build_error_response(self, e: Exception) -> Dict[str, Any]:
+        """构建执行工作流出错时的返回结果"""
+        logger.error(f"执行工作流时发生错误: {str(e)}")
+        logger.exception("详细错误信息:")
+        # 返回一个包含错误信息的结果，而不是抛出异常
+        return {
+            "output": f"抱歉，在处理您的请求时遇到了问题: {str(e)}。请再试一次或尝试其他描述方式。",
+            "error": str(e)
+        }
+    
     async def arun(
         self, 
         user_input: str, 
@@ -1069,66 +1191,7 @@ class VisionWeaverEngine:
             包含工作流响应结果的字典
         """
         try:
-            # 确保每次请求都有唯一的thread_id
-            request_thread_id = thread_id or f"thread_{uuid.uuid4()}"
-            logger.info(f"处理用户输入: {user_input[:50]}... (会话ID: {request_thread_id})")
-            
-            # 处理输入图像路径
-            if input_images:
-                # 验证所有图像路径是否存在
-                valid_images = []
-                for img_path in input_images:
-                    if os.path.exists(img_path):
-                        valid_images.append(img_path)
-                        logger.info(f"添加用户提供的图像: {img_path}")
-                    else:
-                        logger.warning(f"图像路径不存在，忽略: {img_path}")
-                        
-                if valid_images:
-                    logger.info(f"用户提供了 {len(valid_images)} 张有效图像用于合成")
-                else:
-                    logger.warning("所有提供的图像路径都无效，图像合成将被跳过")
-                    input_images = None
-            
-            # 创建初始状态
-            state = {
-                "messages": [HumanMessage(content=user_input)],
-                "current_stage": "initial_assessment",
-                "design_result": None,
-                "image_result": None,
-                "events": [],
-                "start_time": asyncio.get_event_loop().time(),
-                "output": None,
-                "error": None,
-                "request_id": str(uuid.uuid4()),  # 添加唯一请求ID，确保状态隔离
-                "input_images": valid_images if input_images else None,
-                "composed_image_result": None
-            }
-            
-            # 如果有输入图像，添加事件
-            if state["input_images"]:
-                state = self._add_event(state, "input_images_added", {
-                    "message": f"用户提供了 {len(state['input_images'])} 张图像用于合成",
-                    "image_count": len(state["input_images"]),
-                    "image_paths": [os.path.basename(path) for path in state["input_images"]]
-                })
-            
-            # 准备配置
-            config = {
-                # 禁用流式传输，使用直接调用模式
-                "recursion_limit": 25,  # 设置最大递归限制
-                "run_mode": "blocking",  # 使用阻塞模式而非流式
-                "ensure_state_isolation": True  # 确保状态隔离
-            }
-            
-            if self.with_memory and request_thread_id:
-                if "configurable" not in config:
-                    config["configurable"] = {}
-                config["configurable"]["thread_id"] = request_thread_id
-                logger.debug(f"使用会话ID: {request_thread_id}")
-            
-            if callbacks:
-                config["callbacks"] = callbacks
+            state, config = self._prepare_run(user_input, thread_id, callbacks, input_images)
             
             # 执行工作流
             logger.debug("开始执行工作流...")
@@ -1136,40 +1199,52 @@ class VisionWeaverEngine:
             # 异步调用工作流 - 直接使用ainvoke模式，不使用astream
             result = await self.workflow.ainvoke(state, config=config)
             
-            # 计算耗时
-            elapsed = round(asyncio.get_event_loop().time() - state["start_time"], 2)
-            logger.info(f"工作流执行完成，耗时: {elapsed}秒")
-            
-            # 构建返回结果
-            response = {
-                "output": result.get("output", "抱歉，处理过程中出现了问题。"),
-                "events": result.get("events", []),
-                "request_id": result.get("request_id", state["request_id"]),  # 保留请求ID
-                "input_images": result.get("input_images", state["input_images"]),
-                "composed_image_result": result.get("composed_image_result", state["composed_image_result"])
-            }
+            return self._build_response(result, state)
+        except Exception as e:
+            return self._build_error_response(e)
+    
+    async def astream(
+        self, 
+        user_input: str, 
+        thread_id: Optional[str] = None,
+        callbacks: Optional[List[Any]] = None,
+        input_images: Optional[List[str]] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        异步执行工作流，并在事件产生时逐个返回
+        
+        每完成一个工作流阶段，就立即产出该阶段新增的事件，调用方无需等待整个工作流结束。
+        
+        Args:
+            user_input: 用户输入的文本
+            thread_id: 对话线程ID，如启用了内存功能则需要提供
+            callbacks: 可选的回调函数列表
+            input_images: 可选的输入图像路径列表，用于图像合成（如logo、二维码等）
             
-            # 添加错误信息（如果有）
-            if result.get("error"):
-                response["error"] = result["error"]
-                
-            # 添加设计结果（如果有）
-            if result.get("design_result"):
-                response["design_result"] = result["design_result"]
-                
-            # 添加图像结果（如果有）
-            if result.get("image_result"):
-                response["image_result"] = result["image_result"]
+        Yields:
+            (事件类型, 数据) 元组：
+            - ("event", 事件字典)：工作流事件
+            - ("result", 结果字典)：最终结果，与arun的返回值相同，总是最后产出
+        """
+        try:
+            state, config = self._prepare_run(user_input, thread_id, callbacks, input_images, run_mode="streaming")
             
-            return response
+            # 执行工作流
+            logger.debug("开始以流式方式执行工作流...")
+            
+            result = state
+            emitted = 0
+            async for result in self.workflow.astream(state, config=config, stream_mode="values"):
+                # 每个阶段完成后产出新增的事件
+                events = result.get("events") or []
+                for event in events[emitted:]:
+                    yield "event", event
+                emitted = len(events)
         except Exception as e:
-            logger.error(f"执行工作流时发生错误: {str(e)}")
-            logger.exception("详细错误信息:")
-            # 返回一个包含错误信息的结果，而不是抛出异常
-            return {
-                "output": f"抱歉，在处理您的请求时遇到了问题: {str(e)}。请再试一次或尝试其他描述方式。",
-                "error": str(e)
-            }
+            yield "result", self._build_error_response(e)
+            return
+        
+        yield "result", self._build_response(result, state)
     
     def run(
         self, 
@@ -45,6 +45,18 @@ class ImageGeneratorBot:
             
             # 设置模型ID - 使用谷歌官方支持图像生成的模型
             self.model_id = "gemini-2.0-flash-exp-image-generation"
+
+            # 导入Google的生成式AI库，只配置一次API密钥并复用模型实例
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_id)
+
+            # 使用正确的配置参数，使用正确的枚举值格式 (全大写)
+            # 根据Gemini API文档，尺寸参数不通过generation_config参数传递
+            self._generation_config = {
+                "temperature": 0.7,
+                "response_modalities": ["TEXT", "IMAGE"]  # 使用全大写的枚举值
+            }
             logger.info("图片生成机器人初始化完成")
             logger.info(f"使用Google AI API，模型: {self.model_id}")
             
@@ -73,12 +85,6 @@ class ImageGeneratorBot:
         logger.info(f"开始生成图片，提示词: {prompt[:50]}...")
         
         try:
-            # 导入Google的生成式AI库
-            import google.generativeai as genai
-            
-            # 配置API密钥
-            genai.configure(api_key=self.api_key)
-            
             # 构建提示，添加尺寸信息到提示词中
             # 从尺寸参数中提取宽和高
             try:
@@ -111,18 +117,11 @@ class ImageGeneratorBot:
             logger.info("使用Google Generative AI原生API发送请求...")
             logger.info(f"增强后的提示词: {enhanced_prompt[:100]}...")
             
-            # 获取支持图像生成的模型
-            model = genai.GenerativeModel(self.model_id)
-            
-            # 使用正确的配置参数，使用正确的枚举值格式 (全大写)
-            # 根据Gemini API文档，尺寸参数不通过generation_config参数传递
+            # 使用初始化时创建的模型实例
             response = await asyncio.to_thread(
-                model.generate_content,
+                self._model.generate_content,
                 enhanced_prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "response_modalities": ["TEXT", "IMAGE"]  # 使用全大写的枚举值
-                }
+                generation_config=self._generation_config
             )
             
             # 打印详细的响应信息用于调试
@@ -305,8 +304,8 @@ class ImageGeneratorBot:
         if not data_url.startswith('data:image'):
             return None
             
-        # 找到base64数据部分开始的位置
-        base64_start = data_url.find('base64,')
+        # 找到base64数据部分开始的位置（data URL头部很短，只在开头搜索，避免扫描整个数据）
+        base64_start = data_url.find('base64,', 0, 128)
         if base64_start < 0:
             return None
             
@@ -418,7 +417,8 @@ class ImageGeneratorBot:
                         folder_name = re.sub(r'[^\w\u4e00-\u9fa5]', '_', prompt_text[:10])
                         
                         try:
-                            oss_result = await oss_uploader.upload_image(filename, folder_name)
+                            # 图片数据已在内存中，直接上传，无需再读取刚写入的文件
+                            oss_result = await oss_uploader.upload_bytes(img_bytes, os.path.basename(filename), folder_name)
                             if oss_result.get("success"):
                                 logger.info(f"图片已成功上传到OSS: {oss_result.get('url')}")
                                 # 将OSS URL添加到图像数据中
@@ -465,7 +465,7 @@ class ImageGeneratorBot:
                             folder_name = re.sub(r'[^\w\u4e00-\u9fa5]', '_', prompt_text[:10])
                             
                             try:
-                                oss_result = await oss_uploader.upload_image(filename, folder_name)
+                                oss_result = await oss_uploader.upload_bytes(img_bytes, os.path.basename(filename), folder_name)
                                 if oss_result.get("success"):
                                     logger.info(f"图片已成功上传到OSS: {oss_result.get('url')}")
                                     image_data["oss_url"] = oss_result.get("url")
@@ -488,8 +488,9 @@ class ImageGeneratorBot:
                     async with aiohttp.ClientSession() as session:
                         async with session.get(image_data["url"]) as response:
                             if response.status == 200:
+                                img_bytes = await response.read()
                                 with open(filename, "wb") as f:
-                                    f.write(await response.read())
+                                    f.write(img_bytes)
                                 logger.info(f"已下载并保存图片到: {filename}")
                                 
                                 # 判断是否需要上传到OSS
@@ -502,7 +503,7 @@ class ImageGeneratorBot:
                                     folder_name = re.sub(r'[^\w\u4e00-\u9fa5]', '_', prompt_text[:10])
                                     
                                     try:
-                                        oss_result = await oss_uploader.upload_image(filename, folder_name)
+                                        oss_result = await oss_uploader.upload_bytes(img_bytes, os.path.basename(filename), folder_name)
                                         if oss_result.get("success"):
                                             logger.info(f"图片已成功上传到OSS: {oss_result.get('url')}")
                                             image_data["oss_url"] = oss_result.get("url")
@@ -531,6 +532,13 @@ class ImageGeneratorBot:
             logger.error(f"保存图片时发生错误: {str(e)}")
             return None
 
+    def _keep_original_size(self, image_data: Dict, actual_size: str) -> Dict:
+        """不调整图片时，将生成信息中的尺寸更新为图片的实际尺寸"""
+        generation_info = image_data.setdefault("generation_info", {})
+        generation_info["original_size"] = actual_size
+        generation_info["size"] = actual_size
+        return image_data
+    
     async def _resize_image_to_target(self, image_data: Dict, target_size: str) -> Dict:
         """
         将生成的图片调整为目标尺寸
@@ -561,7 +569,12 @@ class ImageGeneratorBot:
             # 记录原始图片尺寸
             original_size = f"{img.width}x{img.height}"
             logger.info(f"图片原始尺寸: {original_size}, 目标尺寸: {target_size}")
-            
+
+            # 宽高误差都不超过1像素时视为已匹配，避免无意义的重采样
+            if abs(img.width - width) <= 1 and abs(img.height - height) <= 1:
+                logger.info("图片尺寸与目标尺寸相差不超过1像素，无需调整")
+                return self._keep_original_size(image_data, original_size)
+
             # 检查原始图片是否已经符合用户请求的比例
             # 如果原始图片比例与用户指定的比例相近，且仅是尺寸不同，保留原始比例
             if "generation_info" in image_data and "prompt" in image_data["generation_info"]:
@@ -589,16 +602,25 @@ class ImageGeneratorBot:
                         logger.info(f"根据用户指定比例调整目标尺寸为: {target_size}")
             
             # 如果尺寸已经匹配，无需调整
-            if f"{img.width}x{img.height}" == target_size:
+            if original_size == target_size:
                 logger.info("图片尺寸已匹配目标尺寸，无需调整")
-                return image_data
+                return self._keep_original_size(image_data, original_size)
+
+            # 如果相对（按用户比例修正后的）目标尺寸仅需小于2%的等比缩放，视觉上无差别，跳过调整
+            target_width, target_height = map(int, target_size.split("x"))
+            scale_w = target_width / img.width
+            scale_h = target_height / img.height
+            if abs(scale_w - scale_h) < 0.005 and abs(scale_w - 1) < 0.02:
+                logger.info(f"图片仅需{abs(scale_w - 1):.1%}的等比缩放，无需调整")
+                return self._keep_original_size(image_data, original_size)
                 
             # 调整图片尺寸
             resized_img = img.resize((width, height), Image.LANCZOS)
             
             # 转换回Base64
+            # 使用最低压缩级别编码PNG，照片类内容压缩收益很小，而默认级别的zlib开销很大
             buffer = io.BytesIO()
-            resized_img.save(buffer, format="PNG")
+            resized_img.save(buffer, format="PNG", compress_level=1, optimize=False)
             b64_resized = base64.b64encode(buffer.getvalue()).decode('utf-8')
             
             # 更新图片数据
@@ -618,6 +640,19 @@ class ImageGeneratorBot:
 # 创建全局实例
 image_generator_bot = ImageGeneratorBot()
 
+# 返回结果中的存储方式，按优先级排列：(结果键, 存储位置, 附加字段, 附加字段对应的结果键)
+_STORAGE_KEYS = (
+    ("oss_url", "阿里云OSS", "OSS路径", "oss_path"),
+    ("url", "远程服务器", None, None),
+    ("local_path", "本地文件系统", "本地路径", "local_path"),
+)
+# 生成信息字段与返回结果字段的对应关系
+_GEN_INFO_LABELS = (
+    ("model", "使用模型"),
+    ("source", "生成来源"),
+    ("size", "图片尺寸"),
+)
+
 
 @tool
 async def generate_image(
@@ -700,6 +735,8 @@ async def generate_image(
         # 将本地路径添加到结果中
         if image_path:
             result["local_path"] = image_path
+            # 图片已写入本地文件，释放可能长达数MB的Base64数据，避免随结果一起传递
+            result.pop("b64_json", None)
         
         # 构建返回结果
         response = {}
@@ -718,38 +755,27 @@ async def generate_image(
                 }
         else:
             # 正常返回完整信息
-            # 如果有OSS URL，优先使用
-            if "oss_url" in result:
-                response["图片URL"] = result["oss_url"]
-                response["存储位置"] = "阿里云OSS"
-                response["OSS路径"] = result.get("oss_path", "")
-            # 如果有普通URL，次之
-            elif "url" in result:
-                response["图片URL"] = result["url"]
-                response["存储位置"] = "远程服务器"
-            # 如果都没有但有本地路径
-            elif "local_path" in result:
-                response["图片URL"] = f"file://{result['local_path']}"
-                response["存储位置"] = "本地文件系统"
-                response["本地路径"] = result["local_path"]
-            # 如果都没有但有Base64数据
-            elif "b64_json" in result:
-                # 截断过长的base64数据
-                b64_preview = result["b64_json"][:30] + "..." if len(result["b64_json"]) > 30 else result["b64_json"]
-                response["图片数据"] = f"Base64编码 ({len(result['b64_json'])} 字节，预览: {b64_preview})"
-                response["存储位置"] = "内存"
-                if "local_path" in result:
-                    response["本地路径"] = result["local_path"]
+            # 按优先级查找存储方式：OSS URL > 普通URL > 本地路径
+            for key, location, extra_label, extra_key in _STORAGE_KEYS:
+                if key in result:
+                    response["图片URL"] = f"file://{result[key]}" if key == "local_path" else result[key]
+                    response["存储位置"] = location
+                    if extra_label:
+                        response[extra_label] = result.get(extra_key, "")
+                    break
+            else:
+                # 如果都没有但有Base64数据
+                if "b64_json" in result:
+                    # 截断过长的base64数据
+                    b64_data = result["b64_json"]
+                    b64_preview = b64_data[:30] + "..." if len(b64_data) > 30 else b64_data
+                    response["图片数据"] = f"Base64编码 ({len(b64_data)} 字节，预览: {b64_preview})"
+                    response["存储位置"] = "内存"
             
             # 添加生成信息
-            if "generation_info" in result:
-                gen_info = result["generation_info"]
-                if "model" in gen_info:
-                    response["使用模型"] = gen_info["model"]
-                if "source" in gen_info:
-                    response["生成来源"] = gen_info["source"]
-                if "size" in gen_info:
-                    response["图片尺寸"] = gen_info["size"]
+            gen_info = result.get("generation_info")
+            if gen_info:
+                response.update({label: gen_info[key] for key, label in _GEN_INFO_LABELS if key in gen_info})
             
             logger.info(f"图片生成成功，即将返回结果")
             return response
@@ -10,13 +10,39 @@ OSS上传工具
 import os
 import time
 import asyncio
+import secrets
 import mimetypes
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from types import MappingProxyType
 from typing import Dict, Optional, Union, List
 from loguru import logger
 
 from langchain_core.tools import tool
+from app.core.config import settings
 from app.utils.aliyun_oss import oss_client
 
+# 最常见的PNG图片上传请求头，预先构建并复用
+_PNG_HEADERS = MappingProxyType({
+    'Content-Type': 'image/png',
+    'x-oss-object-acl': 'public-read'  # 设置为公共可读
+})
+
+
+@lru_cache(maxsize=64)
+def _guess_image_content_type(ext: str) -> str:
+    """根据文件扩展名获取图片的Content-Type，非图片类型默认为image/png"""
+    content_type = mimetypes.guess_type(f"x{ext}")[0]
+    if not content_type or not content_type.startswith('image/'):
+        content_type = 'image/png'  # 默认图片类型
+    return content_type
+
+
+# 已上传文件缓存的最大条目数
+_UPLOAD_CACHE_SIZE = 1024
+
+
 class OssUploader:
     """阿里云OSS上传工具，专用于图片上传"""
     
@@ -24,8 +50,34 @@ class OssUploader:
         """初始化OSS上传工具"""
         self.oss_client = oss_client
         self.image_folder = "images"  # OSS中的图片存储目录
+        # 专用线程池执行同步的oss2调用，线程数即同时进行的最大上传数，避免批量上传时占满连接
+        # 不使用asyncio.Semaphore：全局实例在导入时创建，信号量会绑定到首个使用它的事件循环，
+        # 而engine.run()每次调用都会创建新的事件循环
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.OSS_MAX_CONCURRENT_UPLOADS,
+            thread_name_prefix="oss-upload"
+        )
+        # 已上传文件的LRU缓存: (本地路径, 自定义路径, 修改时间, 文件大小) -> 上传结果
+        self._upload_cache: OrderedDict = OrderedDict()
         logger.info("OSS上传工具初始化完成")
     
+    def _build_headers(self, content_type: str) -> Dict:
+        """根据Content-Type构建上传请求头"""
+        if content_type == 'image/png':
+            return _PNG_HEADERS
+        return {
+            'Content-Type': content_type,
+            'x-oss-object-acl': 'public-read'  # 设置为公共可读
+        }
+    
+    def _build_oss_path(self, filename: str, custom_path: Optional[str] = None) -> str:
+        """构建OSS存储路径"""
+        if custom_path:
+            # 使用自定义路径
+            return f"{self.image_folder}/{custom_path}/{filename}"
+        # 使用随机前缀路径，避免同一秒内的大量上传集中在同一个前缀分区上
+        return f"{self.image_folder}/{secrets.token_hex(3)}/{filename}"
+    
     async def upload_image(self, image_path: str, custom_path: Optional[str] = None) -> Dict:
         """
         上传图片到OSS
@@ -38,47 +90,33 @@ class OssUploader:
             包含上传结果的字典
         """
         try:
-            # 检查文件是否存在
-            if not os.path.exists(image_path):
-                logger.error(f"要上传的图片不存在: {image_path}")
-                return {
-                    "success": False,
-                    "error": f"图片文件不存在: {image_path}"
-                }
+            # 同一文件未发生变化时直接返回上次的上传结果，避免重复上传
+            st = os.stat(image_path)
+            cache_key = (image_path, custom_path, st.st_mtime_ns, st.st_size)
+            cached = self._upload_cache.get(cache_key)
+            if cached is not None:
+                self._upload_cache.move_to_end(cache_key)
+                logger.debug(f"图片已上传过，直接返回缓存结果: {image_path} -> {cached['url']}")
+                return dict(cached)
             
             # 获取文件类型
-            content_type = mimetypes.guess_type(image_path)[0]
-            if not content_type or not content_type.startswith('image/'):
-                content_type = 'image/png'  # 默认图片类型
+            content_type = _guess_image_content_type(os.path.splitext(image_path)[1].lower())
             
             # 设置文件头
-            headers = {
-                'Content-Type': content_type,
-                'x-oss-object-acl': 'public-read'  # 设置为公共可读
-            }
+            headers = self._build_headers(content_type)
             
             # 构建OSS路径
-            filename = os.path.basename(image_path)
-            timestamp = int(time.time())
-            
-            if custom_path:
-                # 使用自定义路径
-                oss_path = f"{self.image_folder}/{custom_path}/{filename}"
-            else:
-                # 使用时间戳路径
-                oss_path = f"{self.image_folder}/{timestamp}/{filename}"
+            oss_path = self._build_oss_path(os.path.basename(image_path), custom_path)
             
             # 异步上传文件
-            url = await asyncio.to_thread(
-                self.oss_client.upload_file,
-                image_path,
-                oss_path,
-                headers
+            url = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                partial(self.oss_client.upload_file, image_path, oss_path, headers)
             )
             
-            logger.info(f"图片上传成功: {image_path} -> {url}")
+            logger.debug(f"图片上传成功: {image_path} -> {url}")
             
-            return {
+            result = {
                 "success": True,
                 "url": url,
                 "oss_path": oss_path,
@@ -86,6 +124,19 @@ class OssUploader:
                 "local_path": image_path
             }
             
+            # 记录到缓存，超出容量时淘汰最久未使用的条目
+            self._upload_cache[cache_key] = result
+            if len(self._upload_cache) > _UPLOAD_CACHE_SIZE:
+                self._upload_cache.popitem(last=False)
+            
+            return dict(result)
+            
+        except FileNotFoundError:
+            logger.error(f"要上传的图片不存在: {image_path}")
+            return {
+                "success": False,
+                "error": f"图片文件不存在: {image_path}"
+            }
         except Exception as e:
             logger.error(f"图片上传失败: {str(e)}")
             logger.exception("详细错误信息:")
@@ -96,6 +147,51 @@ class OssUploader:
                 "local_path": image_path
             }
     
+    async def upload_bytes(self, 
+                           data: bytes, 
+                           filename: str, 
+                           custom_path: Optional[str] = None,
+                           content_type: str = 'image/png') -> Dict:
+        """
+        直接将内存中的图片数据上传到OSS，无需先写入再读取本地文件
+        
+        Args:
+            data: 图片二进制数据
+            filename: OSS中使用的文件名
+            custom_path: 自定义OSS路径，不包含基础目录
+            content_type: 图片的Content-Type
+            
+        Returns:
+            包含上传结果的字典
+        """
+        try:
+            headers = self._build_headers(content_type)
+            oss_path = self._build_oss_path(filename, custom_path)
+            
+            # 异步上传数据
+            url = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                partial(self.oss_client.upload_bytes, data, oss_path, headers)
+            )
+            
+            logger.debug(f"图片数据上传成功: {filename} -> {url}")
+            
+            return {
+                "success": True,
+                "url": url,
+                "oss_path": oss_path,
+                "content_type": content_type
+            }
+            
+        except Exception as e:
+            logger.error(f"图片数据上传失败: {str(e)}")
+            logger.exception("详细错误信息:")
+            
+            return {
+                "success": False,
+                "error": f"图片上传失败: {str(e)}"
+            }
+    
     async def batch_upload_images(self, image_paths: List[str], folder_name: Optional[str] = None) -> Dict:
         """
         批量上传图片到OSS
@@ -114,8 +210,19 @@ class OssUploader:
         # 创建自定义路径
         custom_path = folder_name if folder_name else f"batch_{int(time.time())}"
         
-        for image_path in image_paths:
-            result = await self.upload_image(image_path, custom_path)
+        # 并发上传所有图片，并发数由上传线程池的线程数限制
+        upload_results = await asyncio.gather(
+            *(self.upload_image(image_path, custom_path) for image_path in image_paths),
+            return_exceptions=True
+        )
+        
+        for image_path, result in zip(image_paths, upload_results):
+            if isinstance(result, BaseException):
+                result = {
+                    "success": False,
+                    "error": f"图片上传失败: {str(result)}",
+                    "local_path": image_path
+                }
             results.append(result)
             
             if result.get("success"):
@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 
 import os
+import mmap
 import logging
+import tempfile
 from typing import Optional, Union, BinaryIO, Dict, Any
 
 import oss2
@@ -10,6 +12,11 @@ from oss2.exceptions import OssError
 
 from app.core.config import settings
 
+# 超过该大小的文件使用分片上传，小文件分片反而更慢
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+# 分片大小
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
 class AliyunOSS:
     """
     阿里云OSS操作工具类
@@ -34,7 +41,19 @@ class AliyunOSS:
         
         # 初始化认证和Bucket对象
         self.auth = oss2.Auth(self.access_key, self.secret_key)
-        self.bucket = oss2.Bucket(self.auth, self.endpoint, self.bucket_name)
+        # 显式创建共享的Session，使所有请求复用同一个keep-alive连接池，避免重复TLS握手
+        self.session = oss2.Session(pool_size=settings.OSS_POOL_SIZE)
+        self.bucket = oss2.Bucket(
+            self.auth,
+            self.endpoint,
+            self.bucket_name,
+            session=self.session,
+            connect_timeout=10
+        )
+        
+        # 预先生成文件访问URL的前缀
+        self._host = self.endpoint.replace('http://', '').replace('https://', '')
+        self._url_prefix = f"https://{self.bucket_name}.{self._host}/"
         logging.info(f"阿里云OSS客户端初始化完成，Bucket: {self.bucket_name}, Endpoint: {self.endpoint}")
     
     def upload_file(self, 
@@ -56,37 +75,56 @@ class AliyunOSS:
             FileNotFoundError: 本地文件不存在
             OssError: OSS操作失败
         """
-        logging.info(f"开始上传文件: {local_file_path}")
-        logging.debug(f"OSS目标路径: {oss_file_path}")
-        logging.debug(f"请求头: {headers}")
-        
-        if not os.path.exists(local_file_path):
-            logging.error(f"要上传的文件不存在: {local_file_path}")
-            raise FileNotFoundError(f"文件不存在: {local_file_path}")
+        # 上传路径上的详细日志只在DEBUG级别启用时才输出
+        debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
         
         # 如果没有指定OSS文件路径，则使用本地文件名
         if not oss_file_path:
             oss_file_path = os.path.basename(local_file_path)
-            logging.info(f"未指定OSS路径，使用本地文件名: {oss_file_path}")
+        
+        if debug_enabled:
+            logging.debug(f"开始上传文件: {local_file_path}, OSS目标路径: {oss_file_path}, 请求头: {headers}")
         
         try:
-            # 获取文件大小
-            file_size = os.path.getsize(local_file_path)
-            logging.info(f"文件大小: {file_size} 字节")
-            
-            # 上传文件
-            logging.info(f"开始上传到OSS: {oss_file_path}")
-            result = self.bucket.put_object_from_file(oss_file_path, local_file_path, headers=headers)
+            # 只打开一次文件，通过fstat获取文件大小，文件不存在时open直接抛出FileNotFoundError
+            with open(local_file_path, 'rb') as f:
+                file_size = os.fstat(f.fileno()).st_size
+                
+                # 上传文件
+                if file_size == 0:
+                    # 空文件无法mmap，直接上传
+                    put_headers = oss2.utils.set_content_type(oss2.http.CaseInsensitiveDict(headers), local_file_path)
+                    result = self.bucket.put_object(oss_file_path, b'', headers=put_headers)
+                elif file_size < MULTIPART_THRESHOLD:
+                    # 与put_object_from_file一致，未指定Content-Type时根据文件名推断
+                    put_headers = oss2.utils.set_content_type(oss2.http.CaseInsensitiveDict(headers), local_file_path)
+                    put_headers['Content-Length'] = str(file_size)
+                    # 将文件映射到内存后上传，避免按块读取时产生额外的字节拷贝
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        result = self.bucket.put_object(oss_file_path, mm, headers=put_headers)
+                else:
+                    # 大文件使用多线程分片上传
+                    result = oss2.resumable_upload(
+                        self.bucket,
+                        oss_file_path,
+                        local_file_path,
+                        store=oss2.ResumableStore(root=tempfile.gettempdir()),
+                        headers=headers,
+                        multipart_threshold=MULTIPART_THRESHOLD,
+                        part_size=MULTIPART_PART_SIZE,
+                        num_threads=settings.OSS_UPLOAD_THREADS
+                    )
             
             # 生成访问URL
-            file_url = f"https://{self.bucket_name}.{self.endpoint.replace('http://', '').replace('https://', '')}/{oss_file_path}"
+            file_url = self._url_prefix + oss_file_path
             
-            logging.info(f"文件上传成功: {local_file_path} -> {oss_file_path}")
-            logging.info(f"ETag: {result.etag}")
-            logging.info(f"访问URL: {file_url}")
+            logging.info(f"文件上传成功: {local_file_path} -> {oss_file_path} ({file_size} 字节, ETag: {result.etag}, URL: {file_url})")
             
             return file_url
             
+        except FileNotFoundError:
+            logging.error(f"要上传的文件不存在: {local_file_path}")
+            raise
         except OssError as e:
             logging.error(f"OSS上传失败: {e.code}, {e.message}, {e.request_id}")
             logging.error(f"错误详情: {e.details}")
@@ -94,6 +132,40 @@ class AliyunOSS:
         except Exception as e:
             logging.error(f"上传过程中发生未知错误: {str(e)}")
             raise e
+    
+    def upload_bytes(self, 
+                    data: bytes, 
+                    oss_file_path: str,
+                    headers: Optional[Dict[str, str]] = None) -> str:
+        """
+        上传内存中的数据到OSS
+        
+        Args:
+            data: 要上传的二进制数据
+            oss_file_path: OSS上的文件路径
+            headers: 请求头，可以用来设置Content-Type等
+            
+        Returns:
+            上传后的文件URL
+            
+        Raises:
+            OssError: OSS操作失败
+        """
+        try:
+            result = self.bucket.put_object(oss_file_path, data, headers=headers)
+            
+            # 生成访问URL
+            file_url = self._url_prefix + oss_file_path
+            
+            logging.info(f"数据上传成功: {oss_file_path} ({len(data)} 字节, ETag: {result.etag}, URL: {file_url})")
+            
+            return file_url
+            
+        except OssError as e:
+            logging.error(f"OSS上传失败: {e.code}, {e.message}, {e.request_id}")
+            logging.error(f"错误详情: {e.details}")
+            raise
+    
     def file_exists(self, oss_file_path: str) -> bool:
         """
         检查OSS上是否存在指定文件
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+控制台输入工具
+
+在异步程序中读取用户输入，等待输入期间不阻塞事件循环
+"""
+
+import os
+import sys
+import asyncio
+import threading
+
+
+def _read_line_unbuffered() -> str:
+    """
+    直接从标准输入的文件描述符逐字节读取一行
+    
+    非交互输入（管道、重定向）时input()会持有sys.stdin缓冲区的锁，
+    守护线程阻塞在其中时解释器退出会因无法获取该锁而异常终止
+    """
+    fd = sys.stdin.fileno()
+    buf = bytearray()
+    while True:
+        ch = os.read(fd, 1)
+        if not ch:
+            if not buf:
+                raise EOFError
+            break
+        if ch == b"\n":
+            break
+        buf += ch
+    return buf.decode(sys.stdin.encoding or "utf-8", errors="replace").rstrip("\r")
+
+
+async def ainput(prompt: str = "") -> str:
+    """
+    在后台线程中读取用户输入，等待输入期间不阻塞事件循环
+    
+    使用守护线程而不是默认线程池，按Ctrl+C退出时不会因为等待阻塞中的input()而卡住
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def _set_result(result):
+        if not future.done():
+            future.set_result(result)
+    
+    def _set_exception(exc):
+        if not future.done():
+            future.set_exception(exc)
+    
+    def _read():
+        try:
+            if sys.stdin.isatty():
+                line = input(prompt)
+            else:
+                sys.stdout.write(prompt)
+                sys.stdout.flush()
+                line = _read_line_unbuffered()
+        except BaseException as e:
+            callback, value = _set_exception, e
+        else:
+            callback, value = _set_result, line
+        try:
+            loop.call_soon_threadsafe(callback, value)
+        except RuntimeError:
+            # 事件循环已关闭（程序正在退出），忽略本次输入
+            pass
+    
+    threading.Thread(target=_read, name="ainput", daemon=True).start()
+    return await future
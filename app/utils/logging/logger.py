@@ -13,6 +13,25 @@ from loguru import logger
 
 from app.core.config import settings
 
+# 标准库日志级别名到loguru级别名的映射，避免每条日志都查询loguru的级别表
+_LVL_MAP = {
+    "DEBUG": "DEBUG",
+    "INFO": "INFO",
+    "WARNING": "WARNING",
+    "ERROR": "ERROR",
+    "CRITICAL": "CRITICAL",
+}
+
+# 每个HTTP请求都会输出大量日志的第三方库，只保留WARNING及以上级别
+_NOISY_LOGGERS = (
+    "urllib3",
+    "urllib3.connectionpool",
+    "oss2",
+    "oss2.api",
+    "oss2.http",
+    "requests",
+)
+
 
 def setup_logging():
     """配置日志系统"""
@@ -31,6 +50,13 @@ def setup_logging():
                 "sink": sys.stderr,
                 "format": "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
                 "level": log_level,
+                # 通过后台线程写入，避免终端输出阻塞请求处理
+                "enqueue": True,
+                "backtrace": False,
+                "diagnose": False,
+                "catch": True,
+                # 输出被重定向时不生成颜色控制符
+                "colorize": sys.stderr.isatty(),
             },
             {
                 "sink": logs_dir / "app.log",
@@ -47,32 +73,50 @@ def setup_logging():
     # 应用配置
     logger.configure(**config)
     
+    # loguru中配置的最低日志级别，低于该级别的标准库日志无需处理
+    min_level = logger.level(log_level).no
+    
     # 拦截标准库的日志
     class InterceptHandler(logging.Handler):
+        # 同一调用位置经过的标准库调用栈深度固定，按调用位置缓存
+        _depth_cache = {}
+        
         def emit(self, record):
+            # 低于最低级别的日志直接丢弃，避免无意义的调用栈查找
+            if record.levelno < min_level:
+                return
+            
             # 获取对应的loguru级别
-            try:
-                level = logger.level(record.levelname).name
-            except ValueError:
-                level = record.levelno
+            level = _LVL_MAP.get(record.levelname, record.levelno)
             
             # 查找调用者
-            frame, depth = logging.currentframe(), 2
-            while frame.f_code.co_filename == logging.__file__:
-                frame = frame.f_back
-                depth += 1
+            key = (record.pathname, record.funcName, record.lineno)
+            depth = self._depth_cache.get(key)
+            if depth is None:
+                frame, depth = logging.currentframe(), 2
+                while frame.f_code.co_filename == logging.__file__:
+                    frame = frame.f_back
+                    depth += 1
+                self._depth_cache[key] = depth
             
             # 记录日志
             logger.opt(depth=depth, exception=record.exc_info).log(
                 level, record.getMessage()
             )
     
-    # 配置标准库日志模块
-    logging.basicConfig(handlers=[InterceptHandler()], level=0)
+    # 配置标准库日志模块：只在根logger上安装一个InterceptHandler，子logger通过传播汇总到根logger
+    logging.root.handlers = [InterceptHandler()]
+    logging.root.setLevel(min_level)
+    
+    # 已自带Handler的logger（如uvicorn）清空其Handler并开启传播，避免绕过loguru
+    for existing in list(logging.root.manager.loggerDict.values()):
+        if isinstance(existing, logging.Logger) and existing.handlers:
+            existing.handlers = []
+            existing.propagate = True
     
-    # 替换标准库中的Handler
-    for name in logging.root.manager.loggerDict.keys():
-        logging.getLogger(name).handlers = [InterceptHandler()]
+    # 提高高频第三方日志的级别，低级别日志在创建记录前即被过滤
+    for name in _NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
     
     logger.info(f"日志系统初始化完成，日志级别：{log_level}，日志保存路径：{logs_dir}")
     return logger 
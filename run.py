@@ -15,11 +15,18 @@ load_dotenv()
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
+    is_development = os.getenv("APP_ENV") == "development"
+    # 开发环境使用热重载，只能单进程运行；生产环境由WEB_CONCURRENCY控制工作进程数
+    workers = 1 if is_development else int(os.getenv("WEB_CONCURRENCY", 1))
     
     # 启动FastAPI应用
     uvicorn.run(
         "app.main:app",
         host=host,
         port=port,
-        reload=os.getenv("APP_ENV") == "development"
+        reload=is_development,
+        workers=workers,
+        use_colors=is_development,
+        # 生产环境关闭访问日志，节省每个请求的格式化开销
+        access_log=is_development
     ) 
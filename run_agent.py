@@ -15,72 +15,206 @@ import argparse
 import asyncio
 import time
 import re
-from typing import Optional, Dict, Any
-import readline  # 用于提供输入历史
+import random
+from typing import Optional, Dict, Any, List, Callable, AsyncIterator
+from collections import Counter, deque
+from contextvars import ContextVar
 from datetime import datetime
 from functools import wraps
+from pathlib import Path
 
-from app.core.engine import VisionWeaverEngine
-from app.core.config import settings
 from loguru import logger
 
+from app.utils.console_input import ainput
 
-# 添加API速率限制处理装饰器
-def rate_limiter(max_per_minute=1):
-    """限制函数调用频率的装饰器"""
-    last_called = [0.0]  # 使用列表以便在闭包中可修改
-    min_interval = 60.0 / max_per_minute
+# 仅在交互终端中加载readline，用于提供输入历史
+if sys.stdin.isatty():
+    import readline  # noqa: F401
+
+
+# 终端颜色控制符
+_COLORS = {
+    "red": "\033[91m",
+    "green": "\033[92m",
+    "yellow": "\033[93m",
+    "blue": "\033[94m",
+    "magenta": "\033[95m",
+    "cyan": "\033[96m",
+    "white": "\033[97m",
+    "bold": "\033[1m",
+}
+_COLOR_END = "\033[0m"
+
+# 从429错误信息中提取服务端建议的重试延迟
+_RETRY_DELAY_RE = re.compile(r'retry_delay\s*{\s*seconds:\s*(\d+)')
+
+# Markdown需求文件的预处理规则
+_MD_HEADER_RE = re.compile(r'^#.*$', re.MULTILINE)
+_MD_CODEBLOCK_RE = re.compile(r'```.*?```', re.DOTALL)
+_MD_BLANKLINES_RE = re.compile(r'\n\s*\n')
+
+# 工作流事件类型对应的显示颜色
+_EVENT_COLORS = {
+    "stage_start": "cyan",
+    "tool_start": "yellow",
+    "tool_end": "green",
+    "error": "red",
+    "workflow_end": "magenta",
+}
+
+# 流式执行时默认保留的最近事件数
+_DEFAULT_EVENT_TAIL = 256
+
+# 最终结果中图像生成/合成信息的展示字段: (结果键, 显示名称, 颜色)
+_IMAGE_RESULT_FIELDS = (
+    ("图片URL", "图片URL", "cyan"),
+    ("本地路径", "本地路径", "cyan"),
+    ("图片尺寸", "图片尺寸", "white"),
+)
+_COMPOSED_RESULT_FIELDS = (
+    ("图片URL", "合成图片URL", "magenta"),
+    ("本地路径", "合成图片本地路径", "magenta"),
+    ("合成位置", "合成位置", "white"),
+    ("合成尺寸比例", "合成尺寸", "white"),
+)
+
+# 未指定--rpm（或为0）时的每分钟请求数；测试模式默认每秒一次，与之前测试用例间隔1秒的节奏一致
+_DEFAULT_RPM = 1
+_TEST_RPM = 60
+
+# 需求文件的最大字节数，超过则拒绝读取
+MAX_REQ_BYTES = 1024 * 1024
+
+# 当前任务输出的每行前缀；测试模式并发执行用例时用于标明输出属于哪个用例
+_LINE_PREFIX: ContextVar[str] = ContextVar("_LINE_PREFIX", default="")
+
+# 日志目录是否已创建，只需在首次配置日志时创建
+_LOGS_READY = False
+
+
+class TokenBucket:
+    """令牌桶限流器，允许在容量范围内突发请求"""
     
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            now = time.time()
-            elapsed = now - last_called[0]
+    def __init__(self, capacity: float, refill_rate: float):
+        """
+        初始化令牌桶
+        
+        Args:
+            capacity: 桶容量，即允许的最大突发请求数
+            refill_rate: 每秒补充的令牌数
             
-            if elapsed < min_interval:
-                wait_time = min_interval - elapsed
+        Raises:
+            ValueError: 容量小于1或补充速率不为正数时
+        """
+        if capacity < 1:
+            raise ValueError(f"令牌桶容量必须大于等于1，当前为 {capacity}")
+        if refill_rate <= 0:
+            raise ValueError(f"令牌补充速率必须为正数，当前为 {refill_rate}")
+        
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        # 并发调用共享同一个桶，按先来后到的顺序获取令牌
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """获取一个令牌，桶为空时等待令牌补充"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+                self.last_refill = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                wait_time = (1 - self.tokens) / self.refill_rate
                 print_colored(f"API速率限制: 等待 {wait_time:.1f} 秒...", "yellow")
                 await asyncio.sleep(wait_time)
+
+
+def _is_rate_limit_error(error: Optional[str]) -> bool:
+    """判断错误信息是否为API配额限流（429）错误"""
+    return bool(error) and "429" in error and "quota" in error
+
+
+# 添加API速率限制处理装饰器
+def rate_limiter(max_per_minute=1, burst=1, max_retries=5, max_backoff=64):
+    """
+    限制流式接口（如engine.astream）调用频率的装饰器，基于令牌桶实现，允许最多burst次突发调用
+    
+    engine.astream不会抛出异常：各阶段先产出stage_start事件，LLM调用失败时再产出error事件，
+    最后以("result", {"error": ...})的形式返回错误。最终结果为429限流错误时，
+    使用带随机抖动的截断指数退避重试整个流，最多重试max_retries次，
+    单次等待不超过max_backoff秒（服务端指定了更长的retry_delay时以服务端为准）。
+    重试时与上一次运行开头相同的事件已经展示过，不再重复产出。
+    """
+    bucket = TokenBucket(capacity=burst, refill_rate=max_per_minute / 60.0)
+    
+    def decorator(func):
+        @wraps(func)
+        async def stream_wrapper(*args, **kwargs):
+            # 上一次运行中各事件的(类型, 消息)，用于重试时跳过已展示的事件
+            shown = []
             
-            try:
-                result = await func(*args, **kwargs)
-                last_called[0] = time.time()
-                return result
-            except Exception as e:
-                error_str = str(e)
-                # 检测速率限制错误
-                if "429" in error_str and "quota" in error_str:
-                    # 尝试从错误消息中提取重试延迟时间
-                    retry_delay = 10  # 默认10秒
-                    delay_match = re.search(r'retry_delay\s*{\s*seconds:\s*(\d+)', error_str)
-                    if delay_match:
-                        retry_delay = int(delay_match.group(1))
-                        
-                    print_colored(f"达到API速率限制，将在 {retry_delay} 秒后重试...", "yellow")
+            for attempt in range(max_retries + 1):
+                await bucket.acquire()
+                
+                rate_limit_error = None
+                run_keys = []
+                replaying = attempt > 0
+                async for event_type, payload in func(*args, **kwargs):
+                    if event_type == "event":
+                        key = (payload.get("type"), payload.get("message"))
+                        index = len(run_keys)
+                        run_keys.append(key)
+                        if replaying and index < len(shown) and shown[index] == key:
+                            continue
+                        replaying = False
+                    elif event_type == "result" and _is_rate_limit_error(payload.get("error")):
+                        if attempt < max_retries:
+                            # 暂不返回该结果，稍后重试
+                            rate_limit_error = payload["error"]
+                            continue
+                        if attempt:
+                            print_colored("重试失败，请稍后再试", "red")
+                    yield event_type, payload
+                
+                shown = run_keys
+                
+                if rate_limit_error is None:
+                    return
+                
+                if attempt == 0:
                     print_colored("Google Gemini API对免费用户有以下限制:", "cyan")
                     print_colored("- 每分钟请求数(RPM): 2", "cyan")
                     print_colored("- 每日请求数(RPD): 50", "cyan")
                     print_colored("- 每分钟令牌数(TPM): 32,000", "cyan")
                     print_colored("了解更多: https://ai.google.dev/gemini-api/docs/rate-limits", "cyan")
-                    
-                    await asyncio.sleep(retry_delay)
-                    # 重试请求
-                    print_colored("正在重试请求...", "green")
-                    try:
-                        return await func(*args, **kwargs)
-                    except Exception as retry_error:
-                        # 如果重试也失败，抛出原始错误
-                        print_colored("重试失败，请稍后再试", "red")
-                        raise retry_error
-                else:
-                    # 非速率限制错误，直接抛出
-                    raise
-        return wrapper
+                
+                # 截断指数退避并加入随机抖动，避免多个客户端同时重试
+                delay = min(max_backoff, (2 ** attempt) + random.random())
+                # 尝试从错误消息中提取服务端建议的重试延迟时间
+                delay_match = _RETRY_DELAY_RE.search(rate_limit_error)
+                if delay_match:
+                    delay = max(delay, int(delay_match.group(1)))
+                
+                logger.warning(f"达到API速率限制，第 {attempt + 1}/{max_retries} 次重试将在 {delay:.1f} 秒后进行")
+                print_colored(f"达到API速率限制，将在 {delay:.1f} 秒后重试 ({attempt + 1}/{max_retries})...", "yellow")
+                await asyncio.sleep(delay)
+                
+                # 重试请求
+                print_colored("正在重试请求...", "green")
+        return stream_wrapper
     return decorator
 
 
 def setup_logging(debug: bool = False):
     """配置日志"""
+    global _LOGS_READY
+    
     # 移除默认处理器
     logger.remove()
     
@@ -91,30 +225,35 @@ def setup_logging(debug: bool = False):
     
     # 添加文件日志
     log_dir = "logs"
-    os.makedirs(log_dir, exist_ok=True)
+    if not _LOGS_READY:
+        os.makedirs(log_dir, exist_ok=True)
+        _LOGS_READY = True
     logger.add(f"{log_dir}/visionweaver_{datetime.now().strftime('%Y%m%d')}.log", 
-               rotation="10 MB", level="DEBUG")
+               rotation="10 MB", level="DEBUG", enqueue=True)  # 由后台线程写入文件，不阻塞事件循环
+
+
+def format_colored(text: str, color: str = "white") -> str:
+    """生成带颜色控制符的一行文本"""
+    return f"{_COLORS.get(color, '')}{text}{_COLOR_END}\n"
+
+
+def write_output(text: str):
+    """输出文本，设置了行前缀时为每一行加上前缀"""
+    prefix = _LINE_PREFIX.get()
+    if prefix:
+        text = "".join(prefix + line for line in text.splitlines(keepends=True))
+    sys.stdout.write(text)
 
 
 def print_colored(text: str, color: str = "white"):
     """打印彩色文本"""
-    colors = {
-        "red": "\033[91m",
-        "green": "\033[92m",
-        "yellow": "\033[93m",
-        "blue": "\033[94m",
-        "magenta": "\033[95m",
-        "cyan": "\033[96m",
-        "white": "\033[97m",
-        "bold": "\033[1m",
-        "end": "\033[0m"
-    }
-    
-    print(f"{colors.get(color, '')}{text}{colors['end']}")
+    write_output(format_colored(text, color))
 
 
 def print_welcome():
     """打印欢迎信息"""
+    from app.core.config import settings
+    
     print_colored("\n" + "="*60, "cyan")
     print_colored("欢迎使用 VisionWeaver - AI图像生成与设计助手", "bold")
     print_colored(f"Powered by Google Gemini - 当前模型: {settings.AGENT_MODEL}", "cyan")
@@ -122,87 +261,103 @@ def print_welcome():
     print_colored("="*60 + "\n", "cyan")
 
 
-async def handle_result(result: Dict[str, Any], show_events: bool = True):
-    """处理并展示工作流结果"""
+def print_event(event: Dict[str, Any]):
+    """展示单个工作流事件"""
+    event_type = event.get("type", "未知事件")
+    
+    # 根据事件类型选择颜色
+    color = _EVENT_COLORS.get(event_type, "white")
+    
+    # 格式化输出事件
+    elapsed = event.get("elapsed_seconds", 0)
+    message = event.get("message", "")
+    lines = [format_colored(f"[{elapsed:.2f}s] {event_type}: {message}", color)]
+    
+    # 对于某些事件类型，显示额外信息
+    if event_type == "tool_start" and "tool" in event:
+        lines.append(format_colored(f"  工具: {event.get('tool')}", "white"))
+        if "input" in event:
+            lines.append(format_colored(f"  输入: {event.get('input')}", "white"))
+    
+    # 同一事件的多行一次性输出
+    write_output("".join(lines))
+
+
+def print_event_summary(tail: deque, total: int):
+    """根据保留的最近事件输出事件摘要"""
+    counts = Counter(event.get("type", "未知事件") for event in tail)
+    elapsed = tail[-1].get("elapsed_seconds", 0)
+    
+    lines = [
+        format_colored(f"\n[事件摘要]: 共 {total} 个事件，耗时 {elapsed:.2f}s，最近 {len(tail)} 个事件中:", "blue"),
+        format_colored("  " + ", ".join(f"{event_type} x{count}" for event_type, count in counts.items()), "white"),
+    ]
+    write_output("".join(lines))
+
+
+async def stream_query(astream: Callable[..., AsyncIterator], query: str, thread_id: str,
+                       input_images: Optional[List[str]] = None, show_events: bool = True,
+                       event_tail: int = _DEFAULT_EVENT_TAIL):
+    """
+    以流式方式执行工作流，事件产生时立即展示，结束后展示最终结果
+    
+    astream为已应用速率限制的engine.astream；事件只保留最近event_tail个用于结束后的摘要
+    """
+    result = None
+    events_shown = False
+    tail = deque(maxlen=max(event_tail, 0))
+    total = 0
+    
+    async for event_type, payload in astream(query, thread_id, input_images=input_images):
+        if event_type == "event":
+            tail.append(payload)
+            total += 1
+            if show_events:
+                if not events_shown:
+                    print_colored("\n[工作流事件]:", "blue")
+                    events_shown = True
+                print_event(payload)
+        elif event_type == "result":
+            result = payload
+    
+    if show_events and tail:
+        print_event_summary(tail, total)
+    
+    await handle_terminal_event(result)
+
+
+async def handle_terminal_event(result: Dict[str, Any]):
+    """处理并展示工作流的最终结果"""
     # 检查结果是否有效
     if not result:
         print_colored("\n错误: 未收到任何结果", "red")
         print_colored("请检查日志获取更多信息并尝试再次运行", "yellow")
         return
     
-    # 提取最终回复
+    # 一次性取出结果中的各部分
     final_output = result.get("output")
-    
-    # 显示事件日志
-    if show_events and "events" in result and result["events"]:
-        print_colored("\n[工作流事件]:", "blue")
-        for i, event in enumerate(result["events"]):
-            event_type = event.get("type", "未知事件")
-            
-            # 根据事件类型选择颜色
-            color = "white"
-            if event_type == "stage_start":
-                color = "cyan"
-            elif event_type == "tool_start":
-                color = "yellow"
-            elif event_type == "tool_end":
-                color = "green"
-            elif event_type == "error":
-                color = "red"
-            elif event_type == "workflow_end":
-                color = "magenta"
-            
-            # 格式化输出事件
-            elapsed = event.get("elapsed_seconds", 0)
-            message = event.get("message", "")
-            print_colored(f"[{elapsed:.2f}s] {event_type}: {message}", color)
-            
-            # 对于某些事件类型，显示额外信息
-            if event_type == "tool_start" and "tool" in event:
-                print_colored(f"  工具: {event.get('tool')}", "white")
-                if "input" in event:
-                    print_colored(f"  输入: {event.get('input')}", "white")
+    image_result = result.get("image_result") or {}
+    composed_result = result.get("composed_image_result") or {}
+    error = result.get("error")
     
     # 检查是否有图像生成结果
-    if "image_result" in result:
+    if image_result:
         print_colored("\n[图像生成结果]:", "green")
-        image_result = result["image_result"]
-        
-        # 显示图像URL
-        if "图片URL" in image_result:
-            print_colored(f"图片URL: {image_result['图片URL']}", "cyan")
-        
-        # 显示本地路径
-        if "本地路径" in image_result:
-            print_colored(f"本地路径: {image_result['本地路径']}", "cyan")
-            
-        # 显示图片尺寸和其他元数据
-        if "图片尺寸" in image_result:
-            print_colored(f"图片尺寸: {image_result['图片尺寸']}", "white")
+        for key, label, color in _IMAGE_RESULT_FIELDS:
+            if (value := image_result.get(key)):
+                print_colored(f"{label}: {value}", color)
     
     # 检查是否有图像合成结果
-    if "composed_image_result" in result and result["composed_image_result"]:
+    if composed_result:
         print_colored("\n[图像合成结果]:", "green")
-        composed_result = result["composed_image_result"]
-        
-        # 显示合成图像URL
-        if "图片URL" in composed_result:
-            print_colored(f"合成图片URL: {composed_result['图片URL']}", "magenta")
-        
-        # 显示本地路径
-        if "本地路径" in composed_result:
-            print_colored(f"合成图片本地路径: {composed_result['本地路径']}", "magenta")
-        
-        # 显示合成信息
-        if "合成位置" in composed_result:
-            print_colored(f"合成位置: {composed_result['合成位置']}", "white")
-        if "合成尺寸比例" in composed_result:
-            print_colored(f"合成尺寸: {composed_result['合成尺寸比例']}", "white")
+        for key, label, color in _COMPOSED_RESULT_FIELDS:
+            if (value := composed_result.get(key)):
+                print_colored(f"{label}: {value}", color)
     
     # 检查是否有错误信息
-    if "error" in result:
+    if error:
         print_colored("\n[错误信息]:", "red")
-        print_colored(result["error"], "yellow")
+        print_colored(error, "yellow")
     
     # 检查是否有输出
     if not final_output:
@@ -212,7 +367,7 @@ async def handle_result(result: Dict[str, Any], show_events: bool = True):
         
     print_colored("\n" + "-"*60, "blue")
     print_colored("AI回复:", "bold")
-    print(final_output)
+    write_output(f"{final_output}\n")
 
 
 def parse_arguments():
@@ -234,11 +389,19 @@ def parse_arguments():
     parser.add_argument("--no-memory", action="store_true", help="禁用对话记忆功能")
     
     # 速率限制设置
-    parser.add_argument("--rpm", type=float, default=1.0, help="每分钟最大请求数，用于处理API速率限制 (默认: 1)")
+    parser.add_argument("--rpm", type=float, default=None,
+                       help=f"每分钟最大请求数，用于处理API速率限制 (默认: 普通模式 {_DEFAULT_RPM}，"
+                            f"--test模式 {_TEST_RPM}；测试模式默认更快以缩短测试时间，"
+                            f"但更容易触发免费版的429限流，触发后会自动退避重试)")
+    parser.add_argument("--burst", type=int, default=2,
+                       help="允许的最大突发请求数，--test模式下同时也是并发执行的用例数 "
+                            "(默认: 2，与Gemini免费版RPM一致；调大可缩短测试时间，但更容易触发429限流)")
     
     # 输出控制
     parser.add_argument("-v", "--verbose", action="store_true", help="显示详细信息，包括工作流事件")
     parser.add_argument("--debug", action="store_true", help="启用调试模式，显示更多日志信息")
+    parser.add_argument("--event-tail", type=int, default=_DEFAULT_EVENT_TAIL,
+                       help=f"保留用于事件摘要的最近事件数 (默认: {_DEFAULT_EVENT_TAIL})")
     
     # 图像合成功能
     parser.add_argument("--image", action="append", help="要合成到生成图像中的图片路径(如logo或二维码)，可指定多次添加多张图片")
@@ -246,29 +409,43 @@ def parse_arguments():
     # 简化测试功能
     parser.add_argument("--test", action="store_true", help="测试模式，使用预定义的测试用例")
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    
+    # 突发数为0时令牌桶永远没有令牌，测试模式的信号量也无法获取
+    if args.burst < 1:
+        parser.error(f"--burst 必须大于等于1，当前为 {args.burst}")
+    # 未指定或为0时使用各模式的默认速率，负数无意义
+    if args.rpm is not None and args.rpm < 0:
+        parser.error(f"--rpm 不能为负数，当前为 {args.rpm}")
+    
+    return args
 
 
 def read_requirement_file(file_path):
     """从文件读取需求描述"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
+        p = Path(file_path)
+        
+        # 先检查文件大小，避免读入过大的文件
+        size = p.stat().st_size
+        if size > MAX_REQ_BYTES:
+            raise ValueError(f"文件过大（{size} 字节），最大支持 {MAX_REQ_BYTES} 字节")
+        
+        content = p.read_text(encoding='utf-8').strip()
         
         # 记录文件内容长度
         logger.info(f"从文件 {file_path} 读取了 {len(content)} 字符的需求")
         
         # 检查文件是否为markdown，如果是，可以考虑提取正文内容
-        if file_path.lower().endswith('.md'):
+        if p.suffix.lower() == '.md':
             # 简单处理一下，移除markdown标题和代码块标记
             # 这里只是基础处理，可以根据需要使用更复杂的markdown解析
-            import re
             # 移除 # 开头的标题行
-            content = re.sub(r'^#.*$', '', content, flags=re.MULTILINE)
+            content = _MD_HEADER_RE.sub('', content)
             # 移除代码块标记
-            content = re.sub(r'```.*?```', '', content, flags=re.DOTALL)
+            content = _MD_CODEBLOCK_RE.sub('', content)
             # 移除多余的空行
-            content = re.sub(r'\n\s*\n', '\n\n', content)
+            content = _MD_BLANKLINES_RE.sub('\n\n', content)
             
             logger.info("已处理Markdown格式内容")
         
@@ -278,8 +455,11 @@ def read_requirement_file(file_path):
         raise ValueError(f"无法读取需求文件 {file_path}: {str(e)}")
 
 
-async def run_interactive_mode(engine: VisionWeaverEngine, args):
+async def run_interactive_mode(astream: Callable[..., AsyncIterator], args):
     """运行交互式模式"""
+    # --image参数总会绑定到args上（未指定时为None），只需在入口处读取一次
+    input_images = args.image or None
+    
     print_welcome()
     
     # 不再在函数顶部创建会话ID，而是为每次请求创建新的
@@ -290,9 +470,9 @@ async def run_interactive_mode(engine: VisionWeaverEngine, args):
     print_colored("  'file <路径>' - 从文件读取需求", "cyan")
     
     # 图像合成功能说明
-    if hasattr(args, 'image') and args.image:
-        print_colored(f"\n已指定 {len(args.image)} 张图像用于合成:", "cyan")
-        for img in args.image:
+    if input_images:
+        print_colored(f"\n已指定 {len(input_images)} 张图像用于合成:", "cyan")
+        for img in input_images:
             print_colored(f"  - {img}", "cyan")
         print_colored("这些图像将用于所有对话中的图像合成", "cyan")
     
@@ -300,7 +480,7 @@ async def run_interactive_mode(engine: VisionWeaverEngine, args):
         while True:
             try:
                 # 获取用户输入
-                user_input = input("\n请输入您的需求 > ").strip()
+                user_input = (await ainput("\n请输入您的需求 > ")).strip()
                 
                 # 退出检查
                 if user_input.lower() in ["exit", "quit", "退出", "q"]:
@@ -331,7 +511,7 @@ async def run_interactive_mode(engine: VisionWeaverEngine, args):
                     print_colored("直接输入的多行文本可能导致执行错误。请使用文件输入来处理多行需求。", "yellow")
                     print_colored("您可以使用 'file <文件路径>' 命令从文件读取需求。", "cyan")
                     print_colored("是否仍要继续处理此多行输入? (y/n)", "yellow")
-                    confirm = input("> ").strip().lower()
+                    confirm = (await ainput("> ")).strip().lower()
                     if confirm != 'y':
                         continue
                     
@@ -346,11 +526,7 @@ async def run_interactive_mode(engine: VisionWeaverEngine, args):
                 # 正常输出模式
                 print_colored("AI正在思考...", "yellow")
                 
-                # 获取输入图像路径
-                input_images = args.image if hasattr(args, 'image') and args.image else None
-                
-                result = await engine.arun(user_input, thread_id, input_images=input_images)
-                await handle_result(result, args.verbose)
+                await stream_query(astream, user_input, thread_id, input_images, args.verbose, args.event_tail)
                     
             except KeyboardInterrupt:
                 print_colored("\n\n操作被用户中断。输入'exit'退出或继续输入。", "yellow")
@@ -366,9 +542,10 @@ async def run_interactive_mode(engine: VisionWeaverEngine, args):
     print_colored("\n会话结束。", "blue")
 
 
-async def run_single_query(engine: VisionWeaverEngine, query: str, args):
+async def run_single_query(astream: Callable[..., AsyncIterator], query: str, args):
     """运行单次查询模式"""
     thread_id = args.thread_id or str(uuid.uuid4())
+    input_images = args.image or None
     
     try:
         # 检测多行输入并给予警告
@@ -379,7 +556,7 @@ async def run_single_query(engine: VisionWeaverEngine, query: str, args):
                 print_colored("注意: 直接在命令行中输入的多行文本可能导致执行错误。", "yellow")
                 print_colored("建议使用 -f/--file 参数从文件读取需求。", "cyan")
                 print_colored("是否继续处理此多行输入? (y/n)", "yellow")
-                confirm = input("> ").strip().lower()
+                confirm = (await ainput("> ")).strip().lower()
                 if confirm != 'y':
                     print_colored("已取消操作", "red")
                     return
@@ -388,14 +565,12 @@ async def run_single_query(engine: VisionWeaverEngine, query: str, args):
         print_colored("AI正在处理您的请求...", "yellow")
         
         # 检查是否有输入图像
-        input_images = args.image if hasattr(args, 'image') and args.image else None
         if input_images:
             print_colored(f"将使用 {len(input_images)} 张图像进行合成", "cyan")
             for img in input_images:
                 print_colored(f"  - {img}", "cyan")
         
-        result = await engine.arun(query, thread_id, input_images=input_images)
-        await handle_result(result, args.verbose)
+        await stream_query(astream, query, thread_id, input_images, args.verbose or args.test, args.event_tail)
         
         if not args.thread_id:
             print_colored(f"\n如需继续此对话，请使用会话ID: {thread_id}", "blue")
@@ -413,6 +588,10 @@ async def main():
     # 设置日志
     setup_logging(args.debug)
     
+    # 参数解析完成后再导入应用模块，--help等路径无需加载引擎及其依赖
+    from app.core.config import settings
+    from app.core.engine import VisionWeaverEngine
+    
     # 检查API密钥是否配置
     if not settings.GOOGLE_API_KEY:
         print_colored("错误: 未配置Google API密钥", "red")
@@ -429,24 +608,33 @@ async def main():
         ]
         
         # 如果指定了图像，添加图像合成测试
-        if hasattr(args, 'image') and args.image:
+        if args.image:
             test_queries.append("生成一个产品宣传图，并在右下角加上我们公司的logo")
             test_queries.append("设计一张海报，右下角需要放二维码方便扫码")
         
-        # 初始化测试引擎
+        # 初始化测试引擎；工作流事件由stream_query带用例前缀输出，引擎自身不再打印
         engine = VisionWeaverEngine(
             model_name=args.model,
             temperature=args.temperature,
             with_memory=not args.no_memory,
-            print_debug=True
+            print_debug=False
         )
         
-        # 运行测试用例
-        for i, query in enumerate(test_queries):
-            print_colored(f"\n测试 {i+1}/{len(test_queries)}: {query}", "cyan")
-            await run_single_query(engine, query, args)
-            # 暂停1秒，避免API限制
-            await asyncio.sleep(1)
+        # 由令牌桶控制请求间隔，测试用例可以并发执行
+        rpm_limit = args.rpm or _TEST_RPM
+        astream = rate_limiter(max_per_minute=rpm_limit, burst=args.burst)(engine.astream)
+        sem = asyncio.Semaphore(args.burst)
+        
+        async def run_test_case(i: int, query: str):
+            # 每个用例运行在独立的任务中，前缀只作用于该用例的输出
+            _LINE_PREFIX.set(f"[测试{i+1}] ")
+            async with sem:
+                print_colored(f"\n测试 {i+1}/{len(test_queries)}: {query}", "cyan")
+                await run_single_query(astream, query, args)
+        
+        # 并发运行测试用例
+        tasks = [asyncio.create_task(run_test_case(i, query)) for i, query in enumerate(test_queries)]
+        await asyncio.gather(*tasks, return_exceptions=True)
             
         print_colored("\n测试完成！", "green")
         return
@@ -485,10 +673,9 @@ async def main():
         
         # 应用速率限制装饰器
         # 根据用户指定的请求间隔控制速率
-        rpm_limit = args.rpm if hasattr(args, 'rpm') and args.rpm else 1
-        logger.info(f"设置API请求速率限制为每分钟 {rpm_limit} 次")
-        original_arun = engine.arun
-        engine.arun = rate_limiter(max_per_minute=rpm_limit)(engine.arun)
+        rpm_limit = args.rpm or _DEFAULT_RPM
+        logger.info(f"设置API请求速率限制为每分钟 {rpm_limit} 次，最大突发 {args.burst} 次")
+        astream = rate_limiter(max_per_minute=rpm_limit, burst=args.burst)(engine.astream)
         
         # 处理从文件读取需求的情况
         if args.file:
@@ -502,10 +689,10 @@ async def main():
         
         if args.query:
             # 单次查询模式
-            await run_single_query(engine, args.query, args)
+            await run_single_query(astream, args.query, args)
         else:
             # 交互式模式
-            await run_interactive_mode(engine, args)
+            await run_interactive_mode(astream, args)
             
     except ValueError as e:
         print_colored(f"错误: {str(e)}", "red")
@@ -518,8 +705,12 @@ async def main():
 
 
 if __name__ == "__main__":
-    # 设置颜色支持
-    os.system('')  # 启用VT100转义序列
+    # 设置颜色支持：仅Windows控制台需要显式启用VT100转义序列，无需启动shell子进程
+    if sys.platform == 'win32':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # 7 = ENABLE_PROCESSED_OUTPUT | ENABLE_WRAP_AT_EOL_OUTPUT | ENABLE_VIRTUAL_TERMINAL_PROCESSING
+        kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
     
     # 运行主函数
     try:
@@ -11,11 +11,18 @@
 import os
 import sys
 import json
+import time
 import asyncio
 import argparse
 from pathlib import Path
 from loguru import logger
 
+# 优先使用orjson进行结果序列化，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 确保能够导入app模块
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
@@ -23,11 +30,31 @@ sys.path.insert(0, str(project_root))
 # 导入被测试的组件
 from app.tools.image_designer import ImageDesignerBot, image_designer_bot, image_designer
 from app.core.config import settings
+# 不阻塞事件循环、且可被Ctrl+C中断的输入读取
+from app.utils.console_input import ainput
 
 # 配置日志
 logger.remove()  # 移除默认处理器
 logger.add(sys.stderr, level="INFO")  # 添加stderr处理器
-logger.add("tests/image_designer_test.log", rotation="10 MB", level="DEBUG")  # 添加文件处理器
+logger.add("tests/image_designer_test.log", rotation="10 MB", level="DEBUG", enqueue=True)  # 添加文件处理器，由后台线程写入
+
+# 创建结果目录（只在加载模块时创建一次）
+Path("tests/results").mkdir(parents=True, exist_ok=True)
+
+# 未安装orjson时使用的JSON编码器，所有结果复用同一个实例
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+# 预定义用例同时进行的最大请求数
+_MAX_CONCURRENT_CASES = 3
+
+
+def _write_json(path: str, data) -> None:
+    """将结果序列化为JSON并写入文件（在线程中执行，避免阻塞事件循环）"""
+    if orjson is not None:
+        # orjson直接输出UTF-8字节，不转义非ASCII字符
+        Path(path).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        Path(path).write_text(_JSON_ENCODER.encode(data), encoding="utf-8")
 
 
 async def test_with_input(prompt: str):
@@ -48,9 +75,6 @@ async def test_with_input(prompt: str):
             print("DEEPSEEK_API_BASE=https://api.deepseek.com/v1")
             return
         
-        # 创建结果目录
-        os.makedirs("tests/results", exist_ok=True)
-        
         # 显示进度
         print("\n正在生成设计方案，请稍候...\n")
         
@@ -86,10 +110,9 @@ async def test_with_input(prompt: str):
                     print(f"  {plan}")
             
             # 保存详细结果到文件
-            timestamp = asyncio.get_event_loop().time()
+            timestamp = time.time()
             result_file = f"tests/results/design_result_{int(timestamp)}.json"
-            with open(result_file, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            await asyncio.to_thread(_write_json, result_file, result)
             print(f"\n完整结果已保存至: {result_file}")
         else:
             print(f"返回结果格式不符合预期: {type(result)}")
@@ -126,18 +149,29 @@ async def test_with_predefined_cases():
     
     # 使用全局实例进行测试
     try:
-        # 创建结果目录
-        os.makedirs("tests/results", exist_ok=True)
+        # 并发测试各用例，通过信号量限制同时进行的请求数，避免API限流
+        sem = asyncio.Semaphore(_MAX_CONCURRENT_CASES)
         
-        # 按序测试每个用例
-        for i, test_case in enumerate(test_cases):
-            logger.info(f"\n测试用例 {i+1}: {test_case[:50]}...")
-            print(f"\n正在测试用例 {i+1}/{len(test_cases)}: {test_case}")
+        async def _run(i: int, test_case: str):
+            async with sem:
+                logger.info(f"\n测试用例 {i+1}: {test_case[:50]}...")
+                print(f"\n正在测试用例 {i+1}/{len(test_cases)}: {test_case}")
+                # 调用图片设计机器人 - 使用ainvoke方法
+                return await image_designer.ainvoke({"user_demand": test_case})
+        
+        results = await asyncio.gather(
+            *(_run(i, test_case) for i, test_case in enumerate(test_cases)),
+            return_exceptions=True
+        )
+        
+        # 按用例顺序输出结果
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"测试用例 {i+1} 失败: {str(result)}")
+                print(f"❌ 测试用例 {i+1} 失败: {str(result)}")
+                continue
             
             try:
-                # 调用图片设计机器人 - 使用ainvoke方法
-                result = await image_designer.ainvoke({"user_demand": test_case})
-                
                 # 输出结果概要
                 logger.info(f"测试用例 {i+1} 成功!")
                 print(f"✅ 测试用例 {i+1} 成功!")
@@ -158,8 +192,7 @@ async def test_with_predefined_cases():
                     
                     # 保存详细结果到文件
                     result_file = f"tests/results/case_{i+1}_result.json"
-                    with open(result_file, "w", encoding="utf-8") as f:
-                        json.dump(result, f, ensure_ascii=False, indent=2)
+                    await asyncio.to_thread(_write_json, result_file, result)
                     logger.info(f"完整结果已保存至: {result_file}")
                     print(f"  💾 完整结果已保存至: {result_file}")
                 else:
@@ -169,11 +202,6 @@ async def test_with_predefined_cases():
             except Exception as e:
                 logger.error(f"测试用例 {i+1} 失败: {str(e)}")
                 print(f"❌ 测试用例 {i+1} 失败: {str(e)}")
-            
-            # 在测试用例之间添加延迟，避免API限流
-            if i < len(test_cases) - 1:
-                print(f"  ⏳ 等待2秒后继续下一个测试...")
-                await asyncio.sleep(2)
     
     except Exception as e:
         logger.error(f"测试过程中发生错误: {str(e)}")
@@ -217,8 +245,8 @@ async def test_temperature_adjustment():
         print(f"❌ 温度调整测试失败: {str(e)}")
 
 
-def interactive_mode():
-    """交互式测试模式"""
+async def interactive_mode_async():
+    """交互式测试模式，所有输入共用同一个事件循环"""
     print("\n" + "="*50)
     print("图片设计机器人 - 交互式测试模式")
     print("="*50)
@@ -228,7 +256,11 @@ def interactive_mode():
     while True:
         # 获取用户输入
         print("\n" + "-"*50)
-        user_input = input("请输入图片描述 > ").strip()
+        try:
+            user_input = (await ainput("请输入图片描述 > ")).strip()
+        except (KeyboardInterrupt, EOFError):
+            print("\n用户中断，退出程序。")
+            break
         
         # 检查退出条件
         if user_input.lower() in ['exit', 'quit', '退出', '结束']:
@@ -241,20 +273,20 @@ def interactive_mode():
             continue
         
         # 运行测试
-        asyncio.run(test_with_input(user_input))
+        await test_with_input(user_input)
 
 
-def batch_mode():
+async def batch_mode_async():
     """批处理测试模式"""
     print("\n" + "="*50)
     print("图片设计机器人 - 批处理测试模式")
     print("="*50)
     
     # 运行温度调整测试
-    asyncio.run(test_temperature_adjustment())
+    await test_temperature_adjustment()
     
     # 运行预定义用例测试
-    asyncio.run(test_with_predefined_cases())
+    await test_with_predefined_cases()
 
 
 def main():
@@ -289,11 +321,14 @@ def main():
             # 直接使用提供的描述进行一次测试
             asyncio.run(test_with_input(args.prompt))
         else:
-            # 启动交互式测试
-            interactive_mode()
+            # 启动交互式测试，等待输入时按Ctrl+C会取消事件循环中的任务
+            try:
+                asyncio.run(interactive_mode_async())
+            except KeyboardInterrupt:
+                print("\n用户中断，退出程序。")
     else:
         # 批处理模式
-        batch_mode()
+        asyncio.run(batch_mode_async())
     
     print("\n" + "="*50)
     print("测试完成!")
@@ -11,6 +11,7 @@
 import os
 import sys
 import json
+import time
 import asyncio
 import argparse
 import re
@@ -21,21 +22,31 @@ from loguru import logger
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-# 导入被测试的组件
-from app.tools.image_generator import ImageGeneratorBot, image_generator_bot, generate_image
-from app.core.config import settings
-
 # 配置日志
 logger.remove()  # 移除默认处理器
 logger.add(sys.stderr, level="DEBUG")  # 添加stderr处理器，修改为DEBUG级别
-logger.add("tests/image_generator_test.log", rotation="10 MB", level="DEBUG")  # 添加文件处理器
+logger.add("tests/image_generator_test.log", rotation="10 MB", compression="gz", level="DEBUG", enqueue=True)  # 添加文件处理器，由后台线程写入
+
+# 交互命令中的尺寸设置，如 size:512x512
+_SIZE_RE = re.compile(r'size:(\d+x\d+)')
+# 完整的尺寸格式，如 1024x1024
+_SIZE_FULL_RE = re.compile(r'^\d+x\d+$')
 
+# 生成结果中依次展示的基本信息: (显示名称, 结果键)
+_RESULT_FIELDS = (
+    ("📋 使用模型", "使用模型"),
+    ("📋 生成方式", "生成来源"),
+    ("📏 图片尺寸", "图片尺寸"),
+)
 
-async def test_with_input(prompt: str, size: str = "1024x1024", return_oss_url: bool = False):
+
+async def test_with_input(generate_image, settings, prompt: str, size: str = "1024x1024", return_oss_url: bool = False):
     """
     使用用户输入的描述测试图片生成
     
     Args:
+        generate_image: 被测试的图片生成工具
+        settings: 应用配置
         prompt: 用户输入的图片描述
         size: 生成图片的尺寸，格式为"宽x高"
         return_oss_url: 是否直接返回OSS URL
@@ -78,76 +89,79 @@ async def test_with_input(prompt: str, size: str = "1024x1024", return_oss_url:
         if not result:
             print("\n❌ 错误: 生成结果为空")
             return
-            
-        if isinstance(result, dict) and "错误" in result:
-            print(f"\n❌ 错误: {result['错误']}")
+        
+        if not isinstance(result, dict):
+            print(f"返回结果格式不符合预期: {type(result)}")
+            print(f"结果内容: {result}")
+            return
+        
+        error = result.get("错误")
+        if error is not None:
+            print(f"\n❌ 错误: {error}")
             return
         
         # 输出信息
-        if isinstance(result, dict):
-            # 如果是直接返回OSS URL的简单结果
-            if return_oss_url and "图片URL" in result:
-                print(f"\n🌅 OSS图片URL: {result['图片URL']}")
-                print("  (已直接返回OSS URL)")
-                return
-                
-            # 处理标准结果
-            if "使用模型" in result:
-                print(f"\n📋 使用模型: {result['使用模型']}")
-                
-            if "生成来源" in result:
-                print(f"\n📋 生成方式: {result['生成来源']}")
-            
-            if "图片尺寸" in result:
-                print(f"\n📏 图片尺寸: {result['图片尺寸']}")
-            
-            # 处理图片URL
-            if "图片URL" in result:
-                print(f"\n🌅 图片URL: {result['图片URL']}")
-                
-                # 处理存储位置
-                if "存储位置" in result:
-                    print(f"  (存储位置: {result['存储位置']})")
-                
-                # 处理OSS路径
-                if "OSS路径" in result:
-                    print(f"  OSS路径: {result['OSS路径']}")
-            
-            # 处理图片数据
-            if "图片数据" in result:
-                print(f"\n📊 {result['图片数据']}")
-            
-            # 处理本地路径
-            if "本地路径" in result:
-                print(f"\n💾 本地保存路径: {result['本地路径']}")
-                print("  (图片已保存到本地)")
-            
-            # 保存详细结果到文件
-            os.makedirs("tests/results", exist_ok=True)
-            timestamp = asyncio.get_event_loop().time()
-            result_file = f"tests/results/image_result_{int(timestamp)}.json"
+        image_url = result.get("图片URL")
+        
+        # 如果是直接返回OSS URL的简单结果
+        if return_oss_url and image_url is not None:
+            print(f"\n🌅 OSS图片URL: {image_url}")
+            print("  (已直接返回OSS URL)")
+            return
+        
+        # 处理标准结果
+        for label, key in _RESULT_FIELDS:
+            value = result.get(key)
+            if value is not None:
+                print(f"\n{label}: {value}")
+        
+        # 处理图片URL
+        if image_url is not None:
+            print(f"\n🌅 图片URL: {image_url}")
             
-            with open(result_file, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
-            print(f"\n📄 结果信息已保存至: {result_file}")
+            # 处理存储位置
+            location = result.get("存储位置")
+            if location is not None:
+                print(f"  (存储位置: {location})")
             
-            # 检查debug文件
-            debug_files = [f for f in os.listdir() if f.startswith("debug_response_")]
-            if debug_files:
-                latest_debug_file = max(debug_files, key=os.path.getctime)
-                print(f"\n🔍 调试信息文件: {latest_debug_file}")
-                print("  可查看此文件了解API响应详情")
-        else:
-            print(f"返回结果格式不符合预期: {type(result)}")
-            print(f"结果内容: {result}")
+            # 处理OSS路径
+            oss_path = result.get("OSS路径")
+            if oss_path is not None:
+                print(f"  OSS路径: {oss_path}")
+        
+        # 处理图片数据
+        image_data = result.get("图片数据")
+        if image_data is not None:
+            print(f"\n📊 {image_data}")
+        
+        # 处理本地路径
+        local_path = result.get("本地路径")
+        if local_path is not None:
+            print(f"\n💾 本地保存路径: {local_path}")
+            print("  (图片已保存到本地)")
+        
+        # 保存详细结果到文件（结果目录已在main中创建）
+        timestamp = time.time()
+        result_file = f"tests/results/image_result_{int(timestamp)}.json"
+        
+        # 使用较大的写缓冲，整个结果一次写入
+        with open(result_file, "w", encoding="utf-8", buffering=65536) as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 结果信息已保存至: {result_file}")
     
     except Exception as e:
         print(f"\n❌ 测试失败: {str(e)}")
         logger.error(f"测试失败: {str(e)}")
 
 
-def interactive_mode():
-    """交互式测试模式"""
+def interactive_mode(generate_image, settings):
+    """
+    交互式测试模式
+    
+    Args:
+        generate_image: 被测试的图片生成工具
+        settings: 应用配置
+    """
     print("\n" + "="*50)
     print("图片生成测试 - 交互式模式")
     print("="*50)
@@ -164,58 +178,68 @@ def interactive_mode():
     current_size = "1024x1024"
     current_oss_url = False
     
-    while True:
-        # 获取用户输入
-        print("\n" + "-"*50)
-        print(f"当前设置: 尺寸={current_size}, 直接返回OSS URL={current_oss_url}")
-        try:
-            user_input = input("请输入图片描述 > ").strip()
-        except (KeyboardInterrupt, EOFError):
-            print("\n用户中断，退出程序。")
-            break
-            
-        # 检查输入是否为空
-        if not user_input:
-            print("⚠️ 输入不能为空，请重新输入！")
-            continue
+    # 整个交互会话共用一个事件循环，避免每次生成都重建事件循环
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    
+    try:
+        while True:
+            # 获取用户输入
+            print("\n" + "-"*50)
+            print(f"当前设置: 尺寸={current_size}, 直接返回OSS URL={current_oss_url}")
+            try:
+                user_input = input("请输入图片描述 > ").strip()
+            except (KeyboardInterrupt, EOFError):
+                print("\n用户中断，退出程序。")
+                break
+                
+            # 检查输入是否为空
+            if not user_input:
+                print("⚠️ 输入不能为空，请重新输入！")
+                continue
             
-        # 检查退出条件
-        if user_input.lower() in ['exit', 'quit', '退出', '结束']:
-            print("退出测试程序。")
-            break
+            # 命令均不区分大小写，只转换一次
+            lowered = user_input.lower()
+                
+            # 检查退出条件
+            if lowered in ['exit', 'quit', '退出', '结束']:
+                print("退出测试程序。")
+                break
+                
+            # 检查是否为特殊命令
+            if lowered.startswith('size:'):
+                # 提取尺寸
+                size_match = _SIZE_RE.search(lowered)
+                if size_match:
+                    new_size = size_match.group(1)
+                    current_size = new_size
+                    print(f"✅ 已设置图片尺寸为: {current_size}")
+                else:
+                    print("⚠️ 尺寸格式错误，应为'size:宽x高'，如'size:512x512'")
+                continue
+                
+            if lowered.startswith('oss:'):
+                # 提取OSS设置
+                if 'oss:true' in lowered:
+                    current_oss_url = True
+                    print("✅ 已开启直接返回OSS URL模式")
+                elif 'oss:false' in lowered:
+                    current_oss_url = False
+                    print("✅ 已关闭直接返回OSS URL模式")
+                else:
+                    print("⚠️ OSS设置格式错误，应为'oss:true'或'oss:false'")
+                continue
             
-        # 检查是否为特殊命令
-        if user_input.lower().startswith('size:'):
-            # 提取尺寸
-            size_pattern = r'size:(\d+x\d+)'
-            size_match = re.search(size_pattern, user_input.lower())
-            if size_match:
-                new_size = size_match.group(1)
-                current_size = new_size
-                print(f"✅ 已设置图片尺寸为: {current_size}")
-            else:
-                print("⚠️ 尺寸格式错误，应为'size:宽x高'，如'size:512x512'")
-            continue
+            # 检查输入有效性
+            if len(user_input) < 5:
+                print("⚠️ 请输入至少5个字符的描述！")
+                continue
             
-        if user_input.lower().startswith('oss:'):
-            # 提取OSS设置
-            if 'oss:true' in user_input.lower():
-                current_oss_url = True
-                print("✅ 已开启直接返回OSS URL模式")
-            elif 'oss:false' in user_input.lower():
-                current_oss_url = False
-                print("✅ 已关闭直接返回OSS URL模式")
-            else:
-                print("⚠️ OSS设置格式错误，应为'oss:true'或'oss:false'")
-            continue
-        
-        # 检查输入有效性
-        if len(user_input) < 5:
-            print("⚠️ 请输入至少5个字符的描述！")
-            continue
-        
-        # 运行测试
-        asyncio.run(test_with_input(user_input, current_size, current_oss_url))
+            # 运行测试
+            loop.run_until_complete(test_with_input(generate_image, settings, user_input, current_size, current_oss_url))
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
 
 
 def main():
@@ -249,9 +273,18 @@ def main():
     if args.debug:
         logger.remove()
         logger.add(sys.stderr, level="TRACE")
-        logger.add("tests/image_generator_test.log", rotation="10 MB", level="TRACE")
+        logger.add("tests/image_generator_test.log", rotation="10 MB", compression="gz", level="TRACE", enqueue=True)
         logger.info("已启用详细调试模式")
     
+    # 检查尺寸格式是否正确
+    if not _SIZE_FULL_RE.match(args.size):
+        print(f"错误: 图片尺寸格式错误: {args.size}，应为如 '1024x1024' 的格式")
+        return
+    
+    # 参数检查通过后再导入被测试的组件，--help和参数错误时无需加载应用模块
+    from app.tools.image_generator import image_generator_bot, generate_image
+    from app.core.config import settings
+    
     # 打印测试环境信息
     print("="*50)
     print("图片生成测试")
@@ -261,11 +294,6 @@ def main():
     print(f"图片尺寸: {args.size}")
     print(f"直接返回OSS URL: {args.oss}")
     
-    # 检查尺寸格式是否正确
-    if not re.match(r'^\d+x\d+$', args.size):
-        print(f"错误: 图片尺寸格式错误: {args.size}，应为如 '1024x1024' 的格式")
-        return
-    
     # 确保结果目录存在
     os.makedirs("tests/results", exist_ok=True)
     
@@ -277,10 +305,10 @@ def main():
             return
             
         # 直接使用提供的描述进行一次测试
-        asyncio.run(test_with_input(args.prompt, args.size, args.oss))
+        asyncio.run(test_with_input(generate_image, settings, args.prompt, args.size, args.oss))
     else:
         # 启动交互式测试
-        interactive_mode()
+        interactive_mode(generate_image, settings)
     
     print("\n" + "="*50)
     print("测试完成!")
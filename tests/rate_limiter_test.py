@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+速率限制装饰器测试脚本
+
+使用与VisionWeaverEngine.astream形状一致的模拟流测试run_agent.rate_limiter的429重试：
+各阶段先产出stage_start事件，LLM调用失败时产出error事件，最后以包含错误的result结束
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# 确保能够导入run_agent模块
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from run_agent import rate_limiter
+
+# 模拟Gemini免费版配额用尽时的错误信息
+_QUOTA_ERROR = "初步评估失败: 429 You exceeded your current quota"
+
+
+class FakeEngine:
+    """模拟引擎的流式接口，前fail_times次调用以429错误结束"""
+
+    def __init__(self, fail_times: int, error: str = _QUOTA_ERROR):
+        self.fail_times = fail_times
+        self.error = error
+        self.calls = 0
+
+    async def astream(self, user_input: str, thread_id: str = None, input_images=None):
+        self.calls += 1
+        yield "event", {"type": "stage_start", "message": "开始初步评估"}
+
+        if self.calls <= self.fail_times:
+            yield "event", {"type": "error", "message": f"初步评估出错: {self.error}", "error": self.error}
+            yield "result", {"output": "抱歉，我在理解您的需求时遇到了问题。", "error": self.error}
+            return
+
+        yield "event", {"type": "assessment_complete", "message": "初步评估完成，需要图像生成: False"}
+        yield "event", {"type": "workflow_end", "message": "工作流结束: 不需要图像生成，直接回复用户"}
+        yield "result", {"output": "你好"}
+
+
+async def _collect(engine: FakeEngine, max_retries: int = 3):
+    """用速率限制装饰器包装模拟流并收集全部产出"""
+    # max_backoff=0使退避等待为0秒，测试无需真正等待
+    astream = rate_limiter(max_per_minute=6000, burst=10, max_retries=max_retries, max_backoff=0)(engine.astream)
+    return [item async for item in astream("你好", "thread_test")]
+
+
+def test_retry_after_events():
+    """429错误出现在事件之后时仍然重试，且不重复产出已展示的事件"""
+    engine = FakeEngine(fail_times=2)
+    items = asyncio.run(_collect(engine))
+
+    assert engine.calls == 3
+    event_types = [payload["type"] for kind, payload in items if kind == "event"]
+    assert event_types == ["stage_start", "error", "assessment_complete", "workflow_end"]
+    assert items[-1] == ("result", {"output": "你好"})
+
+
+def test_give_up_after_max_retries():
+    """重试次数用尽后返回最后一次的429错误结果"""
+    engine = FakeEngine(fail_times=10)
+    items = asyncio.run(_collect(engine, max_retries=2))
+
+    assert engine.calls == 3
+    kind, payload = items[-1]
+    assert kind == "result" and payload["error"] == _QUOTA_ERROR
+    assert sum(1 for kind, _ in items if kind == "result") == 1
+
+
+def test_other_errors_not_retried():
+    """非限流错误直接返回，不重试"""
+    engine = FakeEngine(fail_times=1, error="初步评估失败: 网络连接超时")
+    items = asyncio.run(_collect(engine))
+
+    assert engine.calls == 1
+    assert items[-1][1]["error"] == "初步评估失败: 网络连接超时"
+
+
+if __name__ == "__main__":
+    for test in (test_retry_after_events, test_give_up_after_max_retries, test_other_errors_not_retried):
+        test()
+        print(f"✅ {test.__name__}")
+    print("\n所有测试通过!")